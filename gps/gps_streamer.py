@@ -1,35 +1,224 @@
 #!/usr/bin/env python3
 import os
-import json
+import sys
+import gzip
 import time
-import logging
-import datetime
-import subprocess
+import queue
+import signal
+import select
+import socket
+import threading
+import calendar
 import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
 
 from spooler import Spooler
+from utils import Heartbeat, setup_logger
 
 # ------------------------------------------------------------
 # Logging
 # ------------------------------------------------------------
-logging.basicConfig(
-    filename="/var/log/pi5-ptp-node/gps_streamer.log",
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s"
-)
-log = logging.getLogger("gps_streamer")
+# Same queued, batched file logger as the watchdog; see utils.setup_logger.
+# capture_root keeps requests/urllib3 warnings in this log as well.
+log = setup_logger("gps_streamer", capture_root=True)
+
+
+# ------------------------------------------------------------
+# Line protocol: append directly into a bytearray
+# ------------------------------------------------------------
+_SPACE = ord(" ")
+_COMMA = ord(",")
+
+# gpsd always emits compact JSON, so SKY reports contain this verbatim
+_SKY_MARKER = b'"class":"SKY"'
+
+# gpsd SKY satellite keys, unpacked in one pass per satellite
+_SAT_KEYS = ("PRN", "ss", "el", "az", "used", "doppler")
+
+
+def _append_field(buf, sep, name, val):
+    """
+    Append sep + name + value to buf; returns the next separator.
+
+    Ints are written without the line-protocol 'i' suffix on purpose:
+    existing gnss_sky fields are floats, and changing a field's type
+    makes InfluxDB reject the write.
+    """
+    buf.append(sep)
+    buf += name
+    t = type(val)
+    if t is float:
+        buf += b"%r" % val
+    elif t is int:
+        buf += b"%d" % val
+    else:
+        buf += str(val).encode()
+    return _COMMA
+
+
+# Encoded "gnss_sky,prn=N" prefixes; the same PRNs recur every epoch
+_prn_tag_cache = {}
+
+
+def _prn_tag(prn):
+    tag = _prn_tag_cache.get(prn)
+    if tag is None:
+        if len(_prn_tag_cache) >= 512:
+            _prn_tag_cache.clear()
+        tag = f"gnss_sky,prn={prn}".encode()
+        _prn_tag_cache[prn] = tag
+    return tag
+
+
+# ------------------------------------------------------------
+# gpsd timestamps: 'YYYY-MM-DDTHH:MM:SS[.fff]Z' → epoch ns
+# ------------------------------------------------------------
+_timegm = calendar.timegm
+_hour_cache = (None, 0)  # (YYYY-MM-DDTHH prefix, epoch seconds of that hour)
+
+
+def _digits(t):
+    # str.isdigit alone also accepts non-ASCII digits; int() accepts signs,
+    # spaces and underscores, none of which belong in a gpsd timestamp
+    return t.isdigit() and t.isascii()
+
+
+def _hour_epoch(s):
+    """
+    Epoch seconds of the 'YYYY-MM-DDTHH' hour that s starts with, or None
+    if any field is malformed or out of range.
+    """
+    y, mo, d, h = s[0:4], s[5:7], s[8:10], s[11:13]
+    if s[4] != "-" or s[7] != "-" or not (_digits(y) and _digits(mo) and _digits(d) and _digits(h)):
+        return None
+    y, mo, d, h = int(y), int(mo), int(d), int(h)
+    if not (y >= 1 and 1 <= mo <= 12 and h <= 23) or not 1 <= d <= calendar.monthrange(y, mo)[1]:
+        return None
+    return _timegm((y, mo, d, h, 0, 0))
+
+
+def _iso_to_ns(s):
+    """
+    Parse a gpsd UTC timestamp into integer epoch nanoseconds using fixed
+    slices. The epoch of the current hour is cached, so consecutive
+    samples only pay for the minute/second/fraction arithmetic.
+    Returns None for anything that is not a valid time in gpsd's format,
+    with the same range checks as datetime.fromisoformat (so no leap
+    second 60).
+    """
+    global _hour_cache
+    if type(s) is not str or len(s) < 20 or s[10] != "T" or s[-1] != "Z" or s[19] not in ".Z":
+        return None
+
+    key, hour_epoch = _hour_cache
+    if s[:13] != key:
+        hour_epoch = _hour_epoch(s)
+        if hour_epoch is None:
+            return None
+        _hour_cache = (s[:13], hour_epoch)
+
+    mm, ss = s[14:16], s[17:19]
+    if s[13] != ":" or s[16] != ":" or not (_digits(mm) and _digits(ss)):
+        return None
+    minute, second = int(mm), int(ss)
+    if minute > 59 or second > 59:
+        return None
+
+    if s[19] == ".":
+        frac = s[20:-1]
+        if not _digits(frac):
+            return None
+        ns = int(frac[:9].ljust(9, "0"))
+    elif len(s) == 20:
+        ns = 0
+    else:
+        return None
+
+    return (hour_epoch + minute * 60 + second) * 1_000_000_000 + ns
 
 
 # ------------------------------------------------------------
-# Helper: run a shell command and capture output
+# Influx write batching + compression
 # ------------------------------------------------------------
-def run_cmd(cmd):
-    try:
-        out = subprocess.check_output(cmd, shell=True, stderr=subprocess.STDOUT)
-        return out.decode("utf-8", errors="ignore")
-    except Exception as e:
-        log.error(f"Command failed: {cmd} -> {e}")
-        return ""
+BATCH_MAX_LINES = 5000
+REPLAY_INTERVAL = 2.0
+REPLAY_MAX_INTERVAL = 60.0
+GZIP_MIN_BYTES = 1024
+
+# _write_to_influx outcomes. A rejected payload (bad line protocol, field
+# type conflict, too large) fails the same way every time it is resent,
+# so it is dropped rather than spooled or replayed again.
+WRITE_OK = 0
+WRITE_RETRY = 1
+WRITE_REJECTED = 2
+
+# 4xx answers that are about credentials, config or load, not the payload
+_RETRY_4XX = frozenset({401, 403, 404, 408, 429})
+_GZIP_HEADERS = {"Content-Encoding": "gzip"}
+
+# Keep UDP datagrams under a typical Ethernet MTU so they never fragment
+UDP_MAX_DATAGRAM = 1400
+
+
+# ------------------------------------------------------------
+# gpsd client: persistent socket to gpsd's JSON watch stream
+# ------------------------------------------------------------
+class GPSDClient:
+    WATCH = b'?WATCH={"enable":true,"json":true};\n'
+    RECV_BYTES = 65536
+
+    def __init__(self, host="127.0.0.1", port=2947):
+        self.host = host
+        self.port = port
+        self.sock = None
+        self.buffer = bytearray()
+
+    def connect(self):
+        """
+        Connect to gpsd and enable the JSON watch stream.
+        SO_RCVBUF is left to the kernel: the Linux default (tcp_rmem,
+        128 KiB) already holds a top-of-second burst (SKY + TPV + PPS),
+        and setting it explicitly would turn off receive autotuning.
+        read() drains it with 64 KiB recvs, so a burst is one call.
+        """
+        self.close()
+        self.sock = socket.create_connection((self.host, self.port), timeout=5)
+        self.sock.sendall(self.WATCH)
+        self.buffer.clear()
+
+    def close(self):
+        if self.sock:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+    def read(self):
+        """
+        Receive once from gpsd and return the complete JSON lines (bytes).
+        Partial lines stay buffered until the rest arrives.
+        Raises ConnectionError if gpsd closed the connection.
+        """
+        chunk = self.sock.recv(self.RECV_BYTES)
+        if not chunk:
+            raise ConnectionError("gpsd closed the connection")
+
+        # Frame lines in C: one rfind for the last complete line, one
+        # split for all of them, one del to drop the consumed bytes.
+        buf = self.buffer
+        buf.extend(chunk)
+        end = buf.rfind(b"\n")
+        if end < 0:
+            return []
+        lines = bytes(buf[:end]).split(b"\n")
+        del buf[:end + 1]
+        return lines
 
 
 # ------------------------------------------------------------
@@ -53,96 +242,214 @@ class GNSSStreamer:
             f"?org={self.influx_org}&bucket={self.influx_bucket}&precision=ns"
         )
 
+        # One keep-alive session for the life of the process, so each
+        # write reuses the pooled TCP/TLS connection to InfluxDB.
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"Token {self.influx_token}",
+            "Content-Type": "text/plain; charset=utf-8"
+        })
+        # No adapter-level retries: a failed write is spooled, not retried inline
+        self.session.mount(
+            self.influx_url,
+            HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=0)
+        )
+
+        # Optional lossy path: live SKY lines go to a UDP line-protocol
+        # listener (e.g. Telegraf socket_listener) instead of HTTP.
+        self.udp = None
+        self.udp_addr = None
+        udp_addr = os.getenv("INFLUX_UDP_ADDR")
+        if udp_addr:
+            family, self.udp_addr = self._resolve_udp_addr(udp_addr)
+            self.udp = socket.socket(family, socket.SOCK_DGRAM)
+            log.info(f"Live SKY writes over UDP to {udp_addr} (no spool fallback)")
+
+        self.gpsd = GPSDClient()
+        self.heartbeat = Heartbeat()
+
+        # Reader (gpsd → line protocol) and writer (→ Influx) run apart,
+        # so a slow POST never stalls the gpsd socket.
+        self.write_q = queue.Queue(maxsize=10000)
+        self.stop_event = threading.Event()
+        self._writer = None
+        self._next_replay = 0.0
+        self._replay_delay = REPLAY_INTERVAL
+
         log.info("GNSSStreamer initialized (SKY-only)")
 
+    @staticmethod
+    def _resolve_udp_addr(value):
+        """
+        Parse INFLUX_UDP_ADDR ('host:port', or '[v6addr]:port') into a
+        socket family and address. Exits like the other env checks when
+        the value is malformed or does not resolve.
+        """
+        host, _, port = value.rpartition(":")
+        if host.startswith("[") and host.endswith("]"):
+            host = host[1:-1]
+        try:
+            port = int(port)
+            if not host or not 0 < port < 65536:
+                raise ValueError("expected host:port or [v6addr]:port")
+            family, _, _, _, addr = socket.getaddrinfo(host, port, type=socket.SOCK_DGRAM)[0]
+        except (ValueError, OSError) as e:
+            log.error(f"Invalid INFLUX_UDP_ADDR {value!r}: {e}")
+            raise SystemExit(1)
+        return family, addr
+
     # --------------------------------------------------------
-    # Convert gpspipe JSON → Line Protocol (SKY only)
+    # Convert gpsd JSON → Line Protocol (SKY only)
     # --------------------------------------------------------
-    def _convert_to_line_protocol(self, record):
+    def _convert_to_line_protocol(self, record, buf):
+        """
+        Append one gnss_sky line per satellite to buf (a bytearray).
+        Returns the number of lines appended.
+        """
+        # Skip TPV/VERSION/DEVICES/... without paying for a JSON parse
+        if _SKY_MARKER not in record:
+            return 0
+
         try:
-            obj = json.loads(record)
-        except json.JSONDecodeError:
-            return []
+            obj = _json.loads(record)
+        except ValueError:
+            # JSONDecodeError, or invalid UTF-8 under the stdlib fallback
+            return 0
 
         if obj.get("class") != "SKY":
-            return []
+            return 0
 
-        # Timestamp for the whole SKY block
-        timestamp = obj.get("time")
-        if timestamp:
-            try:
-                dt = datetime.datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
-                ts = int(dt.timestamp() * 1_000_000_000)
-            except Exception:
-                ts = None
-        else:
-            ts = None
+        # Timestamp for the whole SKY block; stamp at source when gpsd
+        # omits it so every line carries an explicit ns timestamp
+        ts = _iso_to_ns(obj.get("time"))
+        if ts is None:
+            ts = time.time_ns()
 
         sats = obj.get("satellites", [])
-        lines = []
+        count = 0
 
         for sat in sats:
-            prn = sat.get("PRN")
-            snr = sat.get("ss")
-            el = sat.get("el")
-            az = sat.get("az")
-            used = sat.get("used")
-            doppler = sat.get("doppler")
+            prn, snr, el, az, used, doppler = map(sat.get, _SAT_KEYS)
 
             if prn is None:
                 continue
 
-            # Tags
-            tags = [f"prn={prn}"]
+            # Measurement + tags
+            mark = len(buf)
+            buf += _prn_tag(prn)
 
             # Fields
-            fields = []
+            sep = _SPACE
             if snr is not None:
-                fields.append(f"snr={snr}")
+                sep = _append_field(buf, sep, b"snr=", snr)
             if el is not None:
-                fields.append(f"elevation_deg={el}")
+                sep = _append_field(buf, sep, b"elevation_deg=", el)
             if az is not None:
-                fields.append(f"azimuth_deg={az}")
+                sep = _append_field(buf, sep, b"azimuth_deg=", az)
             if doppler is not None:
-                fields.append(f"doppler_hz={doppler}")
+                sep = _append_field(buf, sep, b"doppler_hz=", doppler)
             if used is not None:
-                fields.append(f"used={1 if used else 0}")
+                sep = _append_field(buf, sep, b"used=", 1 if used else 0)
 
-            if not fields:
+            if sep == _SPACE:
+                # No fields: drop the partial line
+                del buf[mark:]
                 continue
 
-            tag_str = ",".join(tags)
-            field_str = ",".join(fields)
+            buf += b" %d\n" % ts
+            count += 1
 
-            if ts is not None:
-                line = f"gnss_sky,{tag_str} {field_str} {ts}"
-            else:
-                line = f"gnss_sky,{tag_str} {field_str}"
-
-            lines.append(line)
-
-        return lines
+        return count
 
     # --------------------------------------------------------
     # Write to InfluxDB (with spool fallback)
     # --------------------------------------------------------
     def _write_to_influx(self, payload):
-        headers = {
-            "Authorization": f"Token {self.influx_token}",
-            "Content-Type": "text/plain; charset=utf-8"
-        }
+        """
+        POST payload to Influx. Returns WRITE_OK, WRITE_RETRY (network
+        error, 5xx, auth/quota 4xx) or WRITE_REJECTED (any other 4xx).
+        """
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+
+        # Line protocol compresses very well; level 1 is cheap on the Pi
+        headers = None
+        if len(payload) > GZIP_MIN_BYTES:
+            payload = gzip.compress(payload, compresslevel=1)
+            headers = _GZIP_HEADERS
 
         try:
-            r = requests.post(self.write_url, data=payload, headers=headers, timeout=3)
+            r = self.session.post(self.write_url, data=payload, headers=headers, timeout=3)
             if r.status_code == 204:
-                return True
+                return WRITE_OK
 
             log.error(f"Influx write error: {r.status_code} -> {r.text}")
-            return False
+            if 400 <= r.status_code < 500 and r.status_code not in _RETRY_4XX:
+                return WRITE_REJECTED
+            return WRITE_RETRY
 
         except Exception as e:
             log.error(f"Influx write exception: {e}")
-            return False
+            return WRITE_RETRY
+
+    # --------------------------------------------------------
+    # Write to a UDP line-protocol listener (fire-and-forget)
+    # --------------------------------------------------------
+    def _send_udp(self, payload):
+        """
+        Send payload as one or more datagrams split on line boundaries.
+        UDP has no ack, so lost datagrams are dropped, never spooled.
+        """
+        view = memoryview(payload)
+        start = 0
+        end_all = len(payload)
+        while start < end_all:
+            end = end_all
+            if end_all - start > UDP_MAX_DATAGRAM:
+                end = payload.rfind(b"\n", start, start + UDP_MAX_DATAGRAM) + 1
+                if end <= start:
+                    # Single oversized line: send it whole
+                    end = payload.find(b"\n", start) + 1 or end_all
+            try:
+                self.udp.sendto(view[start:end], self.udp_addr)
+            except OSError as e:
+                log.error(f"UDP write exception: {e}")
+            start = end
+
+    # --------------------------------------------------------
+    # gpsd connection + 1 s batching window
+    # --------------------------------------------------------
+    def _connect_gpsd(self):
+        while not self.stop_event.is_set():
+            try:
+                self.gpsd.connect()
+                log.info(f"Connected to gpsd at {self.gpsd.host}:{self.gpsd.port}")
+                return
+            except OSError as e:
+                log.error(f"gpsd connect failed: {e}")
+                self.stop_event.wait(1)
+
+    def _read_window(self, window=1.0):
+        """
+        Collect every gpsd line that arrives within one batching window.
+        Blocks in select() rather than polling, so a quiet gpsd costs nothing.
+        If gpsd drops mid-window, the lines already collected are still
+        returned and the socket is closed; the reader loop reconnects.
+        """
+        lines = []
+        deadline = time.monotonic() + window
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                ready, _, _ = select.select([self.gpsd.sock], [], [], remaining)
+                if ready:
+                    lines.extend(self.gpsd.read())
+        except OSError as e:
+            log.error(f"gpsd read failed: {e}")
+            self.gpsd.close()
+        return lines
 
     # --------------------------------------------------------
     # Main loop
@@ -150,36 +457,167 @@ class GNSSStreamer:
     def start(self):
         log.info("GNSSStreamer starting (SKY-only)")
 
-        # Drain backlog first
-        backlog = self.spool.dequeue()
-        if backlog:
-            log.info(f"Draining backlog: {len(backlog)} records")
-            for payload in backlog:
-                if not self._write_to_influx(payload):
-                    self.spool.enqueue(payload)
-                    break
+        self._writer = threading.Thread(target=self._writer_loop, name="influx-writer", daemon=True)
+        self._writer.start()
+        try:
+            self._reader_loop()
+        finally:
+            self.stop()
 
-        # Live streaming loop
-        while True:
-            out = run_cmd("gpspipe -w -n 10")
-            batch = []
+    # --------------------------------------------------------
+    # Backlog replay, interleaved with live writes by the writer
+    # --------------------------------------------------------
+    def _replay_batch(self):
+        """
+        Replay up to BATCH_MAX_LINES spooled lines, gathered across spool
+        files, in one POST. Returns the number of lines written, or None
+        if the write failed. The spool only drops the lines once the POST
+        succeeds; on a retryable failure its read position is rewound, so
+        the same lines are retried without being spooled twice. A batch
+        Influx rejects outright is committed and logged, so it cannot
+        block the rest of the backlog.
+        """
+        lines = []
+        while len(lines) < BATCH_MAX_LINES:
+            line = self.spool.dequeue()
+            if line is None:
+                break
+            lines.append(line)
 
-            for line in out.splitlines():
-                lp_lines = self._convert_to_line_protocol(line)
-                if not lp_lines:
-                    continue
-                batch.extend(lp_lines)
+        if not lines:
+            return 0
+
+        result = self._write_to_influx("\n".join(lines))
+        if result == WRITE_RETRY:
+            self.spool.rewind()
+            return None
+        self.spool.commit()
+        if result == WRITE_REJECTED:
+            log.error(f"Dropped {len(lines)} spooled records rejected by Influx")
+            return 0
+        return len(lines)
+
+    def _maybe_replay(self):
+        """
+        Replay one backlog batch if one is due. A full batch means more is
+        waiting, so the next one is due immediately; otherwise wait
+        REPLAY_INTERVAL before looking at the spool again. Failed replays
+        back off, doubling the wait up to REPLAY_MAX_INTERVAL.
+        """
+        now = time.monotonic()
+        if now < self._next_replay or not self.spool.has_data():
+            return
+
+        count = self._replay_batch()
+        if count is None:
+            self._replay_delay = min(self._replay_delay * 2, REPLAY_MAX_INTERVAL)
+            self._next_replay = now + self._replay_delay
+            return
+
+        self._replay_delay = REPLAY_INTERVAL
+        if count:
+            log.info(f"Replayed {count} spooled records")
+        if count < BATCH_MAX_LINES:
+            self._next_replay = now + REPLAY_INTERVAL
+
+    def stop(self):
+        self.stop_event.set()
+        if self._writer:
+            self._writer.join(timeout=10)
+        if self._writer and self._writer.is_alive():
+            # Still inside a POST: it may yet spool, so leave the fd open
+            log.warning("Influx writer still running at shutdown; spool not closed")
+        else:
+            # Writer is done spooling: sync what the periodic fdatasync missed
+            self.spool.close()
+        self.gpsd.close()
+        self.heartbeat.clear()
+        self.session.close()
+        if self.udp:
+            self.udp.close()
+
+    # --------------------------------------------------------
+    # Producer: gpsd → line protocol → write queue
+    # --------------------------------------------------------
+    def _reader_loop(self):
+        while not self.stop_event.is_set():
+            if self.gpsd.sock is None:
+                # First start, or the last window ended with gpsd gone
+                self._connect_gpsd()
+                continue
+
+            lines = self._read_window()
+
+            if lines:
+                self.heartbeat.beat()
+
+            batch = bytearray()
+            count = 0
+            for line in lines:
+                count += self._convert_to_line_protocol(line, batch)
 
             if batch:
-                payload = "\n".join(batch)
-                if not self._write_to_influx(payload):
-                    self.spool.enqueue(payload)
+                payload = bytes(batch)
+                try:
+                    self.write_q.put_nowait((payload, count))
+                except queue.Full:
+                    # Writer is far behind: spool rather than block the reader
+                    self.spool.enqueue(payload.decode("utf-8").rstrip("\n"))
+
+    # --------------------------------------------------------
+    # Consumer: write queue → one POST per drained batch
+    # --------------------------------------------------------
+    def _writer_loop(self):
+        while True:
+            # One bad iteration (ENOSPC while spooling, a spool read error)
+            # must not silently kill the only thread that writes to Influx
+            try:
+                # Live data first: only replay backlog while nothing is
+                # queued, and never start a replay POST once stopping
+                if self.write_q.empty() and not self.stop_event.is_set():
+                    self._maybe_replay()
+
+                try:
+                    payload, count = self.write_q.get(timeout=1.0)
+                except queue.Empty:
+                    if self.stop_event.is_set():
+                        return
+                    continue
 
-            time.sleep(1)
+                # Each queued window is already at most 1 s old; coalesce
+                # whatever else is waiting, up to BATCH_MAX_LINES per POST.
+                items = [payload]
+                while count < BATCH_MAX_LINES:
+                    try:
+                        payload, n = self.write_q.get_nowait()
+                    except queue.Empty:
+                        break
+                    items.append(payload)
+                    count += n
+
+                payload = b"".join(items)
+                if self.udp:
+                    self._send_udp(payload)
+                else:
+                    result = self._write_to_influx(payload)
+                    if result == WRITE_RETRY:
+                        self.spool.enqueue(payload.decode("utf-8").rstrip("\n"))
+                        # Influx is down: hold off replay until the next interval
+                        self._next_replay = time.monotonic() + REPLAY_INTERVAL
+                    elif result == WRITE_REJECTED:
+                        log.error(f"Dropped {count} live records rejected by Influx")
+            except Exception:
+                log.exception("Influx writer iteration failed")
+                self.stop_event.wait(1)
 
 
 # ------------------------------------------------------------
 # Entrypoint
 # ------------------------------------------------------------
 if __name__ == "__main__":
+    # systemd stops us with SIGTERM; exit through start()'s finally so the
+    # writer flushes queued windows before the process ends
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
     streamer = GNSSStreamer()
+    streamer.start()
@@ -1,20 +1,38 @@
+import sys
 import time
-from utils import setup_logger, run_cmd
+import signal
+from utils import setup_logger, run_cmd_check, run_cmds, run_cmd_breakered, ChronyClient, Heartbeat, parse_chrony_tracking
 from spooler import Spooler
 
 logger = setup_logger("gps_watchdog")
 
+# systemctl restart waits for the unit to come back up
+RESTART_TIMEOUT = 30.0
+
 class Watchdog:
     def __init__(self):
         self.spool = Spooler("/var/spool/pi5-ptp-node")
+        self.chrony = ChronyClient()
+        self.gpsd_heartbeat = Heartbeat()
 
     def gpsd_ok(self):
-        out = run_cmd("pgrep gpsd")
-        return bool(out.strip())
+        # The streamer stamps a heartbeat whenever gpsd data arrives. The
+        # age is only reported while that streamer is alive, so a stale
+        # stamp means gpsd itself has gone quiet.
+        age = self.gpsd_heartbeat.age()
+        if age is not None:
+            return age < 30
+
+        # Streamer not running (or died without clearing its stamp):
+        # fall back to checking the process
+        return run_cmd_check("pgrep gpsd") == 0
 
     def chrony_ok(self):
-        out = run_cmd("chronyc tracking")
-        return "Leap status     : Normal" in out
+        tracking = self.chrony.tracking()
+        if tracking is None:
+            # chronyd's command port unreachable: fall back to chronyc
+            tracking = parse_chrony_tracking(run_cmd_breakered("chronyc tracking"))
+        return bool(tracking) and tracking.get("leap_status") == "Normal"
 
     def influx_ok(self):
         # Simple check: if spool is growing, Influx is unreachable
@@ -33,17 +51,25 @@ class Watchdog:
                 f"influx_ok={influx_ok} spool={spool_bytes}"
             )
 
+            restarts = []
             if not gpsd_ok:
-                run_cmd("systemctl restart gpsd")
+                restarts.append("systemctl restart gpsd")
 
             if not chrony_ok:
-                run_cmd("systemctl restart chrony")
+                restarts.append("systemctl restart chrony")
 
             if not influx_ok:
-                run_cmd("systemctl restart gps-streamer")
+                restarts.append("systemctl restart gps-streamer")
+
+            # Independent units: restart them concurrently, not one by one
+            run_cmds(restarts, timeout=RESTART_TIMEOUT)
 
             time.sleep(10)
 
 
 if __name__ == "__main__":
+    # systemd stops us with SIGTERM; exit normally so atexit flushes the
+    # batched log records instead of the process dying with them
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
     Watchdog().start()
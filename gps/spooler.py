@@ -1,9 +1,33 @@
 import os
-import json
 import time
 import threading
 from pathlib import Path
-from typing import Optional, Dict, Any, Iterable
+from typing import Optional, Dict, Any, Iterable, List, Tuple
+
+try:
+    import orjson
+
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+    import json
+
+    def _dumps(record) -> bytes:
+        return json.dumps(record, separators=(",", ":")).encode("utf-8")
+
+    _loads = json.loads
+
+
+def _file_order(name: str) -> Tuple[int, int]:
+    """
+    Sort key for 'spool_<timestamp>_<sequence>.log': creation order from
+    the name itself, so ordering files needs no stat() call.
+    """
+    try:
+        timestamp, sequence = name[6:-4].split("_")
+        return int(timestamp), int(sequence)
+    except ValueError:
+        return 0, 0
 
 
 class Spooler:
@@ -16,118 +40,265 @@ class Spooler:
     - Supports background draining while live data continues.
     """
 
+    # Writes between size-limit checks (the limit may overshoot by this many)
+    ENFORCE_EVERY = 256
+
+    # fdatasync after this many writes or this many seconds, whichever
+    # comes first: bounds what a power cut can lose without a sync per record
+    SYNC_EVERY = 64
+    SYNC_INTERVAL = 5.0
+
     def __init__(self, spool_dir: str, max_bytes: int = 20_000_000_000):
         self.spool_dir = Path(spool_dir)
+        # Internals work on plain str paths; Path stays at the public API
+        self._dir = os.fspath(self.spool_dir)
         self.max_bytes = max_bytes
         self.spool_dir.mkdir(parents=True, exist_ok=True)
 
         # Files are named with a monotonic timestamp and sequence
         self._lock = threading.Lock()
-        self._current_file = None
+        self._current_fd = None
         self._current_file_path = None
         self._current_size = 0
         self._sequence = int(time.time())
 
+        # Read position for dequeue(), kept between calls
+        self._drain_path = None
+        self._drain_handle = None
+        # Last acknowledged position (see commit()/rewind()), and older
+        # files read to the end since then, deleted only on commit()
+        self._commit_path = None
+        self._commit_offset = 0
+        self._consumed: List[str] = []
+
+        # Running total of spool bytes; only recomputed from disk at startup
+        # and when the size limit actually has to delete something.
+        self._total_bytes = sum(size for _, size in self._scan())
+        self._writes_since_enforce = 0
+        self._writes_since_sync = 0
+        self._last_sync = time.monotonic()
+
         self._open_new_file()
 
     def _open_new_file(self):
-        if self._current_file:
-            self._current_file.close()
+        if self._current_fd is not None:
+            self._sync()
+            os.close(self._current_fd)
 
         timestamp = int(time.time())
         self._sequence += 1
         filename = f"spool_{timestamp}_{self._sequence}.log"
-        self._current_file_path = self.spool_dir / filename
-        self._current_file = self._current_file_path.open("a", buffering=1)
+        self._current_file_path = os.path.join(self._dir, filename)
+        # Raw O_APPEND fd: one os.write() per append, no Python file layer
+        self._current_fd = os.open(
+            self._current_file_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644
+        )
         self._current_size = 0
 
-    def _rotate_if_needed(self):
+    def close(self):
+        """
+        fdatasync anything written since the last periodic sync and release
+        the file handles. Call once on shutdown, after the last append.
+        """
+        with self._lock:
+            if self._current_fd is not None:
+                self._sync()
+                os.close(self._current_fd)
+                self._current_fd = None
+        if self._drain_handle is not None:
+            self._drain_handle.close()
+            self._drain_handle = None
+            self._drain_path = None
+
+    def _rotate_if_needed(self) -> bool:
         if self._current_size > 10_000_000:  # ~10MB per file
             self._open_new_file()
+            return True
+        return False
+
+    def _write(self, data: bytes):
+        """
+        Append bytes to the current spool file. Caller holds self._lock.
+        """
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._current_fd, view):]
+
+        self._writes_since_sync += 1
+        if (self._writes_since_sync >= self.SYNC_EVERY
+                or time.monotonic() - self._last_sync >= self.SYNC_INTERVAL):
+            self._sync()
+
+        self._account_write(len(data))
+
+    def _sync(self):
+        """
+        Flush the current file's data to storage. Caller holds self._lock.
+        """
+        if self._writes_since_sync:
+            os.fdatasync(self._current_fd)
+            self._writes_since_sync = 0
+        self._last_sync = time.monotonic()
+
+    def _account_write(self, nbytes: int):
+        """
+        Book-keeping after a write. The size limit is enforced right after a
+        rotation or every ENFORCE_EVERY writes, not on every record.
+        Caller holds self._lock.
+        """
+        self._current_size += nbytes
+        self._total_bytes += nbytes
+        self._writes_since_enforce += 1
+
+        if self._rotate_if_needed() or self._writes_since_enforce >= self.ENFORCE_EVERY:
+            self._writes_since_enforce = 0
+            self._enforce_size_limit()
+
+    def _scan(self) -> List[Tuple[str, int]]:
+        """
+        Return (path, size) for every spool file, oldest first, using a
+        single os.scandir pass and one stat() per file.
+        """
+        entries = []
+        with os.scandir(self._dir) as it:
+            for entry in it:
+                name = entry.name
+                if not (name.startswith("spool_") and name.endswith(".log")):
+                    continue
+                try:
+                    size = entry.stat().st_size
+                except FileNotFoundError:
+                    continue
+                entries.append((_file_order(name), entry.path, size))
+        entries.sort()
+        return [(path, size) for _, path, size in entries]
+
+    def _unlink(self, path):
+        """
+        Delete a fully consumed spool file and take it off the running total.
+        """
+        try:
+            size = os.stat(path).st_size
+            os.unlink(path)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self._total_bytes -= size
 
     def _enforce_size_limit(self):
         """
         Ensure total spool size <= max_bytes by deleting oldest files first.
+        Free while under the limit: only the running total is checked.
+        Caller holds self._lock.
         """
-        files = sorted(self.spool_dir.glob("spool_*.log"), key=lambda p: p.stat().st_mtime)
-        total = sum(f.stat().st_size for f in files)
+        if self._total_bytes <= self.max_bytes:
+            return
 
-        while total > self.max_bytes and files:
-            oldest = files.pop(0)
-            size = oldest.stat().st_size
+        files = self._scan()
+        total = sum(size for _, size in files)
+        current = self._current_file_path
+
+        for path, size in files:
+            if total <= self.max_bytes:
+                break
+            if path == current:
+                continue
             try:
-                oldest.unlink()
+                os.unlink(path)
                 total -= size
             except FileNotFoundError:
                 pass
 
+        self._total_bytes = total
+
     def append(self, record: Dict[str, Any]):
         """
         Append a single JSON-serializable record to the spool.
         """
-        line = json.dumps(record, separators=(",", ":")) + "\n"
-        data = line.encode("utf-8")
+        data = _dumps(record) + b"\n"
 
         with self._lock:
-            self._current_file.write(line)
-            self._current_size += len(data)
-            self._rotate_if_needed()
-            self._enforce_size_limit()
+            self._write(data)
+
+    def append_many(self, records: Iterable[Dict[str, Any]]):
+        """
+        Append several JSON-serializable records with a single write.
+        Rotation and the size limit are checked once for the whole batch.
+        """
+        data = b"".join(_dumps(r) + b"\n" for r in records)
+        if not data:
+            return
+
+        with self._lock:
+            self._write(data)
 
     def iter_files_in_order(self) -> Iterable[Path]:
         """
         Yield spool files in chronological order (oldest first).
         """
-        files = sorted(self.spool_dir.glob("spool_*.log"), key=lambda p: p.stat().st_mtime)
-        for f in files:
-            yield f
+        for path, _ in self._scan():
+            yield Path(path)
 
     def drain(self, handler, stop_event: Optional[threading.Event] = None, batch_size: int = 1000):
         """
         Drain spooled records using the provided handler(record_list) function.
 
-        - handler is called with a list of records.
-        - If handler raises, draining stops and files are left intact.
-        - If handler succeeds, processed lines are removed by deleting the file
-          once fully consumed.
+        - handler is called with lists of up to batch_size records; batches
+          span file boundaries, so small files do not produce tiny batches.
+        - A file is deleted only after every record from it has been handed
+          to handler successfully.
+        - If handler raises, draining stops and unconfirmed files are left
+          intact (records already delivered from them may be replayed).
+        - The file currently being written is not drained.
         - stop_event can be used to gracefully stop draining.
         """
-        for path in self.iter_files_in_order():
-            if stop_event and stop_event.is_set():
-                break
+        records = []
+        pending = []    # files fully read, waiting on the batch holding their tail
+        current = self._current_file_path
+
+        def flush():
+            nonlocal records
+            # Only pending files left (e.g. all-blank tail): no empty batch.
+            # Each call gets its own list; the handler may keep it.
+            if records:
+                handler(records)
+                records = []
+            for done in pending:
+                self._unlink(done)
+            pending.clear()
+
+        try:
+            for path, _ in self._scan():
+                if stop_event and stop_event.is_set():
+                    break
+                if path == current:
+                    continue
 
-            records = []
-            try:
-                with path.open("r") as f:
-                    for line in f:
-                        line = line.strip()
-                        if not line:
-                            continue
-                        try:
-                            rec = json.loads(line)
-                            records.append(rec)
-                        except json.JSONDecodeError:
-                            # Skip corrupted lines
-                            continue
-
-                        if len(records) >= batch_size:
-                            handler(records)
-                            records = []
-
-                    if records:
-                        handler(records)
-
-                # If we got here, handler never raised for this file
                 try:
-                    path.unlink()
+                    # Raw bytes lines go straight to loads(); the trailing
+                    # newline is valid JSON whitespace
+                    with open(path, "rb") as f:
+                        for line in f:
+                            try:
+                                rec = _loads(line)
+                                records.append(rec)
+                            except ValueError:
+                                # Skip corrupted or blank lines
+                                continue
+
+                            if len(records) >= batch_size:
+                                flush()
                 except FileNotFoundError:
-                    pass
+                    continue
 
-            except FileNotFoundError:
-                continue
-            except Exception:
-                # Any unexpected error: stop draining to avoid data loss
-                break
+                pending.append(path)
+
+            if records or pending:
+                flush()
+
+        except Exception:
+            # Any unexpected error: stop draining to avoid data loss
+            return
 
     # ==================================================================
     #  Compatibility Layer for gps_streamer.py
@@ -138,43 +309,101 @@ class Spooler:
         Store a raw line payload (string) into the spool.
         Streamer uses this for line-based GNSS JSON.
         """
+        data = payload.encode("utf-8") + b"\n"
+
         with self._lock:
-            self._current_file.write(payload + "\n")
-            self._current_size += len(payload) + 1
-            self._rotate_if_needed()
-            self._enforce_size_limit()
+            self._write(data)
 
     def dequeue(self) -> Optional[str]:
         """
-        Return the next raw line from the oldest spool file.
-        Deletes the file when empty.
+        Return the next raw line from the oldest spool file, or None.
+
+        The open file and its read offset are kept between calls, so each
+        pop is a single readline(). Nothing is deleted here: lines handed
+        out stay on disk until commit() acknowledges them, and rewind()
+        hands them out again. Every other spool file, whatever its name,
+        is read before the file currently being written, which is only
+        read up to its end. Lines already committed from a partly read
+        file are replayed after a crash, which Influx tolerates since
+        rewriting a point is idempotent.
         """
-        for path in self.iter_files_in_order():
-            try:
-                with path.open("r") as f:
-                    lines = f.readlines()
-                if not lines:
-                    path.unlink()
+        while True:
+            if self._drain_handle is None:
+                # The live file goes last: files named after it (clock
+                # stepped back at boot, restart within the same second)
+                # must not be stranded behind its never-ending tail
+                live = self._current_file_path
+                files = [p for p, _ in self._scan() if p not in self._consumed and p != live]
+                path = files[0] if files else live
+                if path is None:
+                    return None
+                try:
+                    self._drain_handle = open(path, "rb")
+                except FileNotFoundError:
                     continue
+                self._drain_path = path
+                if path == self._commit_path:
+                    self._drain_handle.seek(self._commit_offset)
 
-                first = lines[0].rstrip("\n")
+            line = self._drain_handle.readline()
+            if line.endswith(b"\n"):
+                line = line[:-1]
+                if not line:
+                    continue
+                return line.decode("utf-8", errors="ignore")
 
-                # Rewrite file without the first line
-                if len(lines) > 1:
-                    with path.open("w") as f:
-                        f.writelines(lines[1:])
-                else:
-                    path.unlink()
+            if self._drain_path == self._current_file_path:
+                # Caught up with the live file; rewind any partial line
+                if line:
+                    self._drain_handle.seek(-len(line), os.SEEK_CUR)
+                return None
 
-                return first
+            # EOF of an older file: move on, delete it on commit()
+            self._drain_handle.close()
+            self._drain_handle = None
+            self._consumed.append(self._drain_path)
+            if line:
+                return line.decode("utf-8", errors="ignore")
 
-            except FileNotFoundError:
-                continue
+    def commit(self):
+        """
+        Acknowledge every line dequeue() has returned so far: fully read
+        files are deleted and the read position becomes the restart point.
+        """
+        for path in self._consumed:
+            self._unlink(path)
+        self._consumed.clear()
+
+        if self._drain_handle is None:
+            self._commit_path, self._commit_offset = None, 0
+        else:
+            self._commit_path = self._drain_path
+            self._commit_offset = self._drain_handle.tell()
+
+    def rewind(self):
+        """
+        Forget lines dequeue() returned since the last commit(), so the
+        next dequeue() hands them out again. Nothing is re-written.
+        """
+        self._consumed.clear()
+        if self._drain_handle is not None:
+            self._drain_handle.close()
+            self._drain_handle = None
+        self._drain_path = None
 
-        return None
+    def has_data(self) -> bool:
+        """
+        True if anything is spooled that has not been committed, from the
+        running total (no disk access).
+        """
+        committed = self._commit_offset if self._commit_path == self._current_file_path else 0
+        return self._total_bytes > committed
 
     def size_bytes(self) -> int:
         """
         Return total spool size in bytes.
+
+        Always read from disk: the watchdog calls this from its own process,
+        where the running total of the writer is not visible.
         """
-        return sum(f.stat().st_size for f in self.spool_dir.glob("spool_*.log"))
+        return sum(size for _, size in self._scan())
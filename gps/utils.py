@@ -1,42 +1,201 @@
 import os
+import re
+import asyncio
+import mmap
 import time
+import shlex
+import socket
+import struct
+import queue
+import atexit
+import random
 import logging
+import warnings
+import threading
 import subprocess
-from pathlib import Path
+from logging.handlers import QueueHandler, QueueListener, MemoryHandler, RotatingFileHandler
+from typing import Optional, Dict, Any, Tuple, Sequence, List, Set
 
 
 # ======================================================================
 #  Logging Helper
 # ======================================================================
 
-def setup_logger(name: str, log_dir: str = "/var/log/pi5-ptp-node", level=logging.INFO):
+_LOGGER_LOCK = threading.Lock()
+_LOGGER_CACHE: Dict[Tuple[str, str], logging.Logger] = {}
+# log_dirs already created; later loggers there skip the filesystem
+_DIRS_READY: Set[str] = set()
+
+# Buffered records are written at least this often, or at once on ERROR+
+LOG_FLUSH_INTERVAL = 30.0
+
+# Each log rotates at about this size, keeping this many old files
+LOG_MAX_BYTES = 5_000_000
+LOG_BACKUP_COUNT = 3
+_FLUSH_HANDLERS = []
+_flush_thread = None
+
+# The format below uses none of these; skip their per-record lookups
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+
+
+class _SecondCachedFormatter(logging.Formatter):
+    """
+    Formatter whose timestamp has one-second resolution, so strftime runs
+    once per second rather than once per record.
+    """
+
+    _last = (None, "")
+
+    def formatTime(self, record, datefmt=None):
+        sec = int(record.created)
+        cached_sec, text = self._last
+        if sec != cached_sec:
+            text = time.strftime(datefmt or self.datefmt, self.converter(sec))
+            self._last = (sec, text)
+        return text
+
+
+# Python 3.13-safe logging format, parsed once and shared by every logger.
+# Each logger's listener thread formats with it; the cached timestamp is
+# a single tuple swap, so concurrent use at worst recomputes one second.
+_SHARED_FMT = _SecondCachedFormatter(
+    "%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    "%Y-%m-%d %H:%M:%S"
+)
+
+
+class _BufferedFileHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler writing encoded bytes through a 128 KiB binary
+    buffer, so many records leave as one large write(). emit() neither
+    flushes nor checks the size; rotation is decided after each flush,
+    so a file may overshoot maxBytes by one batch.
+    """
+
+    BUFFER_BYTES = 131072
+
+    def _open(self):
+        return open(self.baseFilename, self.mode.replace("t", "") + "b",
+                    buffering=self.BUFFER_BYTES)
+
+    def emit(self, record):
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            line = self.format(record) + self.terminator
+            self.stream.write(line.encode(self.encoding or "utf-8",
+                                          self.errors or "backslashreplace"))
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        with self.lock:
+            super().flush()
+            if self.stream and self.maxBytes and self.stream.tell() >= self.maxBytes:
+                self.doRollover()
+
+
+class _FlushingMemoryHandler(MemoryHandler):
+    """
+    MemoryHandler that also flushes its target, so one flush of the batch
+    becomes one write() of the file buffer.
+    """
+
+    def flush(self):
+        with self.lock:
+            super().flush()
+            if self.target:
+                self.target.flush()
+
+
+def _flush_loop():
+    while True:
+        time.sleep(LOG_FLUSH_INTERVAL)
+        for handler in list(_FLUSH_HANDLERS):
+            handler.flush()
+
+
+def setup_logger(name: str, log_dir: str = "/var/log/pi5-ptp-node", level=logging.INFO,
+                 capture_root: bool = False):
     """
     Creates a rotating logger for streamer/watchdog.
     Ensures:
     - log directory exists
     - no duplicate handlers
     - clean timestamped formatting
+    - callers never block on disk: the logger only gets a QueueHandler,
+      and a QueueListener thread owns the actual file write
+    - records are batched (512 records, 30 s, or any ERROR) into one
+      buffered write instead of one write() per line
+    - the file rotates at ~5 MB, keeping 3 old copies (name.log.1..3)
+    - with capture_root, records from every other logger (requests,
+      urllib3, ...) go to the same file through the root logger
+
+    Repeat calls for the same (name, log_dir) are a dict lookup and do not
+    touch the filesystem; they still apply level.
     """
-    Path(log_dir).mkdir(parents=True, exist_ok=True)
-    log_path = Path(log_dir) / f"{name}.log"
+    key = (name, log_dir)
+    hit = _LOGGER_CACHE.get(key)
+    if hit is not None:
+        hit.setLevel(level)
+        return hit
+
+    with _LOGGER_LOCK:
+        hit = _LOGGER_CACHE.get(key)
+        if hit is not None:
+            hit.setLevel(level)
+            return hit
+
+        if log_dir not in _DIRS_READY:
+            os.makedirs(log_dir, exist_ok=True)
+            _DIRS_READY.add(log_dir)
+        log_path = os.path.join(log_dir, f"{name}.log")
 
-    logger = logging.getLogger(name)
-    logger.setLevel(level)
+        logger = logging.getLogger(name)
+        logger.setLevel(level)
 
-    # Avoid duplicate handlers if reloaded
-    if logger.handlers:
-        return logger
+        # Same name already configured under another log_dir: keep one file
+        if logger.handlers:
+            _LOGGER_CACHE[key] = logger
+            return logger
 
-    handler = logging.FileHandler(log_path)
+        handler = _BufferedFileHandler(
+            log_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT,
+            encoding="utf-8", delay=True
+        )
+        handler.setFormatter(_SHARED_FMT)
+        batch = _FlushingMemoryHandler(
+            capacity=512, flushLevel=logging.ERROR, target=handler, flushOnClose=True
+        )
 
-    # Python 3.13-safe logging format
-    formatter = logging.Formatter(
-        "%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-        "%Y-%m-%d %H:%M:%S"
-    )
+        # SimpleQueue.put is a lock-free C append; stop() at exit drains it.
+        # atexit runs LIFO: the listener drains first, then the batch flushes.
+        log_queue = queue.SimpleQueue()
+        listener = QueueListener(log_queue, batch)
+        atexit.register(batch.flush)
+        listener.start()
+        atexit.register(listener.stop)
 
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
+        global _flush_thread
+        _FLUSH_HANDLERS.append(batch)
+        if _flush_thread is None:
+            _flush_thread = threading.Thread(target=_flush_loop, name="log-flush", daemon=True)
+            _flush_thread.start()
+
+        queue_handler = QueueHandler(log_queue)
+        logger.addHandler(queue_handler)
+        if capture_root:
+            root = logging.getLogger()
+            root.addHandler(queue_handler)
+            root.setLevel(level)
+            # Already handled above; reaching root too would log it twice
+            logger.propagate = False
+        # Publish only once the handler is attached: the lock-free lookup
+        # above must never hand out a logger that drops records
+        _LOGGER_CACHE[key] = logger
 
     return logger
 
@@ -45,38 +204,559 @@ def setup_logger(name: str, log_dir: str = "/var/log/pi5-ptp-node", level=loggin
 #  Retry Helper
 # ======================================================================
 
-def retry(operation, attempts=3, delay=0.5, exceptions=(Exception,)):
+def _backoff(i: int, base: float, cap: float) -> float:
+    """Full-jitter sleep before retry number i (0-based)."""
+    return random.uniform(0, min(cap, base * (1 << i)))
+
+
+def retry(operation, attempts=3, base=0.2, cap=5.0, exceptions=(Exception,), delay=None):
     """
     Simple retry wrapper for small operations.
 
     Example:
-        result = retry(lambda: do_something(), attempts=5, delay=1.0)
+        result = retry(lambda: do_something(), attempts=5, base=0.5)
+
+    Between attempts it sleeps a random 0..min(cap, base * 2**i) seconds
+    (exponential backoff with full jitter), so the streamer and watchdog
+    retrying the same device do not wake up in lockstep.
+
+    delay is a deprecated alias for base.
 
     If all attempts fail, the last exception is raised.
     """
+    if delay is not None:
+        warnings.warn("retry(delay=) is deprecated, use base=", DeprecationWarning, stacklevel=2)
+        base = delay
+
+    # Single attempt: nothing to retry, skip the loop and handler
+    if attempts <= 1:
+        return operation()
+
     for i in range(attempts):
         try:
             return operation()
         except exceptions:
             if i == attempts - 1:
                 raise
-            time.sleep(delay)
+            time.sleep(_backoff(i, base, cap))
+
+
+async def retry_async(coro_factory, attempts=3, base=0.2, cap=5.0, exceptions=(Exception,)):
+    """
+    Coroutine version of retry: backs off with asyncio.sleep, so the event
+    loop keeps running between attempts.
+
+    coro_factory is a zero-argument callable returning a new awaitable for
+    each attempt (a coroutine cannot be awaited twice):
+
+        out = await retry_async(lambda: run_cmd_async(["chronyc", "tracking"]))
+    """
+    for i in range(attempts):
+        try:
+            return await coro_factory()
+        except exceptions:
+            if i == attempts - 1:
+                raise
+            await asyncio.sleep(_backoff(i, base, cap))
 
 
 # ======================================================================
 #  Command Helper (required by streamer + watchdog)
 # ======================================================================
 
-def run_cmd(cmd: str) -> str:
+# Command strings are a handful of literals; split each one only once
+_CMD_CACHE: Dict[str, Tuple[str, ...]] = {}
+
+
+def _argv(cmd: str) -> Tuple[str, ...]:
+    argv = _CMD_CACHE.get(cmd)
+    if argv is None:
+        argv = _CMD_CACHE.setdefault(cmd, tuple(shlex.split(cmd)))
+    return argv
+
+
+def run_argv(argv: Sequence[str], timeout: float = 2.0) -> str:
+    """
+    Exec argv directly (no /bin/sh) and return stdout as UTF-8 text.
+    Returns an empty string on failure, or if the command runs past
+    timeout seconds (the child is then killed).
+    """
+    try:
+        out = subprocess.check_output(argv, stderr=subprocess.STDOUT, timeout=timeout)
+        return out.decode("utf-8", errors="ignore")
+    except Exception:
+        # Includes TimeoutExpired; check_output has already killed the child
+        return ""
+
+
+def run_cmd(cmd: str, timeout: float = 2.0) -> str:
     """
-    Executes a shell command and returns stdout as UTF-8 text.
-    Returns an empty string on failure.
+    Executes a command and returns stdout as UTF-8 text.
+    Returns an empty string on failure or after timeout seconds, so a
+    wedged gpsd or chronyd cannot stall the caller.
+
+    The command is split with shlex (once per distinct string, then
+    cached) and exec'd directly (no /bin/sh), so shell syntax such as
+    pipes or redirects is not supported.
 
     This is intentionally simple and resilient because the streamer
     and watchdog rely on it for gpspipe, chronyc, pgrep, etc.
     """
+    return run_argv(_argv(cmd), timeout)
+
+
+def run_cmd_check(cmd: str, timeout: float = 2.0) -> int:
+    """
+    Run a command for its exit status only, e.g. "pgrep gpsd". Output
+    goes to /dev/null, so no pipe is read and nothing is decoded.
+    Returns 1 if the command cannot be run or exceeds timeout seconds.
+    """
     try:
-        out = subprocess.check_output(cmd, shell=True, stderr=subprocess.STDOUT)
-        return out.decode("utf-8", errors="ignore")
+        return subprocess.call(
+            _argv(cmd), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=timeout
+        )
+    except Exception:
+        return 1
+
+
+class CircuitBreaker:
+    """
+    Short-circuits a flaky call after repeated failures.
+
+    After fail_threshold consecutive falsy results the breaker opens, and
+    call() returns "" without calling fn until reset_after seconds
+    have passed. The next call is then let through as a probe: a truthy
+    result closes the breaker, another failure re-opens it.
+    """
+
+    def __init__(self, fail_threshold: int = 5, reset_after: float = 10.0):
+        self.fail_threshold = fail_threshold
+        self.reset_after = reset_after
+        self._fails = 0
+        self._opened_at: Optional[float] = None
+
+    def call(self, fn, *args, **kwargs):
+        if self._opened_at is not None:
+            if time.monotonic() - self._opened_at < self.reset_after:
+                return ""
+            self._opened_at = None
+
+        result = fn(*args, **kwargs)
+        if result:
+            self._fails = 0
+        else:
+            self._fails += 1
+            if self._fails >= self.fail_threshold:
+                self._opened_at = time.monotonic()
+        return result
+
+
+# One breaker per command string, so one dead tool does not mask another
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+
+
+def run_cmd_breakered(cmd: str, timeout: float = 2.0) -> str:
+    """
+    run_cmd behind a per-command CircuitBreaker. Only for commands whose
+    empty output means failure (chronyc, gpspipe), not ones that are
+    silent on success such as systemctl restart. Timeouts count as
+    failures, so a command that keeps hanging trips the breaker.
+    """
+    breaker = _BREAKERS.get(cmd)
+    if breaker is None:
+        breaker = _BREAKERS.setdefault(cmd, CircuitBreaker())
+    return breaker.call(run_cmd, cmd, timeout)
+
+
+async def run_cmd_async(argv: Sequence[str], timeout: float = 2.0) -> str:
+    """
+    Coroutine version of run_cmd: execs argv (no shell) and returns stdout
+    as UTF-8 text, or an empty string on failure or timeout. The event
+    loop keeps running while the child works; a child that overruns
+    timeout is killed.
+    """
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *argv, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT
+        )
+    except Exception:
+        return ""
+
+    try:
+        out, _ = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        return ""
     except Exception:
         return ""
+    return out.decode("utf-8", errors="ignore")
+
+
+async def run_cmds_batch(argvs: Sequence[Sequence[str]], timeout: float = 2.0) -> List[str]:
+    """
+    Run several commands concurrently and return their outputs in order,
+    each with run_cmd_async's "" on failure or timeout. The batch takes
+    as long as its slowest command, not the sum of all of them.
+    """
+    return list(await asyncio.gather(*(run_cmd_async(a, timeout) for a in argvs)))
+
+
+def run_cmds(cmds: Sequence[str], timeout: float = 2.0) -> List[str]:
+    """
+    Blocking wrapper around run_cmds_batch for run_cmd-style command
+    strings. Must not be called from inside a running event loop.
+    """
+    if not cmds:
+        return []
+    return asyncio.run(run_cmds_batch([_argv(c) for c in cmds], timeout))
+
+
+class PersistentCmd:
+    """
+    Long-lived child process read line by line, so a repeated poll pays
+    the fork+exec once instead of every tick (e.g. "gpspipe -w" for a
+    JSON stream, or "chronyc -m" fed commands on stdin).
+
+    The child is spawned on first use. When it exits, readline() and
+    query() raise ConnectionError and the next call starts a fresh one,
+    so wrapping a call in retry() restarts the command:
+
+        gpspipe = PersistentCmd(["gpspipe", "-w"])
+        line = retry(gpspipe.readline)
+    """
+
+    READ_BYTES = 4096
+
+    def __init__(self, argv: Sequence[str]):
+        self.argv = tuple(argv)
+        self.proc: Optional[subprocess.Popen] = None
+        # Unbuffered pipes: stdout is framed here, complete lines only
+        self._buf = bytearray()
+
+    def _ensure(self) -> subprocess.Popen:
+        # Respawn only once EOF has closed the old child, so output it
+        # wrote before exiting is still read
+        if self.proc is None:
+            self.proc = subprocess.Popen(
+                self.argv,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                bufsize=0,
+            )
+        return self.proc
+
+    def readline(self) -> str:
+        """
+        Return the next stdout line without its newline.
+        """
+        fd = self._ensure().stdout.fileno()
+        buf = self._buf
+        start = 0
+        while True:
+            i = buf.find(b"\n", start)
+            if i >= 0:
+                break
+            start = len(buf)
+            chunk = os.read(fd, self.READ_BYTES)
+            if not chunk:
+                self.close()
+                raise ConnectionError(f"{self.argv[0]} exited")
+            buf += chunk
+
+        line = bytes(buf[:i])
+        del buf[:i + 1]
+        return line.decode("utf-8", errors="ignore")
+
+    def query(self, command: str, sentinel: str = "") -> str:
+        """
+        Write one command line to stdin and return the output lines up to
+        (not including) the sentinel line.
+        """
+        proc = self._ensure()
+        try:
+            proc.stdin.write((command + "\n").encode("utf-8"))
+        except OSError:
+            self.close()
+            raise ConnectionError(f"{self.argv[0]} exited")
+
+        lines = []
+        while True:
+            line = self.readline()
+            if line == sentinel:
+                return "\n".join(lines)
+            lines.append(line)
+
+    def close(self):
+        proc, self.proc = self.proc, None
+        self._buf.clear()
+        if proc is None:
+            return
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+        for stream in (proc.stdin, proc.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+
+# ======================================================================
+#  Heartbeat Helper (streamer → watchdog liveness)
+# ======================================================================
+
+HEARTBEAT_PATH = "/dev/shm/pi5-ptp-node.gpsd_heartbeat"
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, owned by another user
+        return True
+    return True
+
+
+class Heartbeat:
+    """
+    Cross-process liveness stamp: one CLOCK_MONOTONIC nanosecond value in
+    a small tmpfs file.
+
+    The streamer mmaps the file and stamps it with a plain memory store
+    whenever gpsd data arrives. The watchdog reads it back with os.pread,
+    so checking gpsd health no longer needs a socket or a pgrep fork.
+    CLOCK_MONOTONIC is system-wide, so the two processes compare directly.
+
+    The writer's pid sits after the stamp. A stamp left behind by a
+    streamer that died without clear() (SIGKILL, OOM, crash) reads as no
+    heartbeat, so a stale age always means a live streamer hearing
+    nothing from gpsd.
+    """
+
+    _STAMP = struct.Struct("<Q")
+    _PID = struct.Struct("<I")
+    _SIZE = _STAMP.size + _PID.size
+
+    def __init__(self, path: str = HEARTBEAT_PATH):
+        self.path = path
+        self._map = None
+
+    def beat(self):
+        if self._map is None:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                os.ftruncate(fd, self._SIZE)
+                self._map = mmap.mmap(fd, self._SIZE)
+            finally:
+                os.close(fd)
+            self._PID.pack_into(self._map, self._STAMP.size, os.getpid())
+        self._STAMP.pack_into(self._map, 0, time.monotonic_ns())
+
+    def age(self) -> Optional[float]:
+        """
+        Seconds since the last beat, or None if nobody is beating (no
+        stamp, or the process that wrote it no longer exists).
+        """
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        try:
+            data = os.pread(fd, self._SIZE, 0)
+        finally:
+            os.close(fd)
+
+        if len(data) < self._SIZE:
+            return None
+        stamp, = self._STAMP.unpack_from(data)
+        pid, = self._PID.unpack_from(data, self._STAMP.size)
+        if not stamp or not _pid_alive(pid):
+            return None
+        return (time.monotonic_ns() - stamp) / 1e9
+
+    def clear(self):
+        """
+        Stop advertising liveness (clean shutdown), so readers fall back.
+        """
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+# ======================================================================
+#  Chrony Helper (native command protocol, no chronyc fork)
+# ======================================================================
+
+def _chrony_float(x: int) -> float:
+    """
+    Decode chrony's 32-bit wire float: 7-bit signed exponent followed by
+    a 25-bit signed coefficient (see util.c UTI_FloatNetworkToHost).
+    """
+    exp = x >> 25
+    if exp >= 1 << 6:
+        exp -= 1 << 7
+    coef = x & ((1 << 25) - 1)
+    if coef >= 1 << 24:
+        coef -= 1 << 25
+    return coef * 2.0 ** (exp - 25)
+
+
+class ChronyClient:
+    """
+    Minimal client for chronyd's UDP command port (127.0.0.1:323),
+    implementing only REQ_TRACKING. Replaces a 'chronyc tracking' fork
+    per poll with one request/response datagram pair.
+
+    tracking() returns None on any failure so callers can fall back
+    to run_cmd("chronyc tracking").
+    """
+
+    PROTO_VERSION = 6
+    PKT_TYPE_CMD_REQUEST = 1
+    PKT_TYPE_CMD_REPLY = 2
+    REQ_TRACKING = 33
+    RPY_TRACKING = 5
+    STT_SUCCESS = 0
+
+    # Request header: version, pkt_type, res1, res2, command, attempt,
+    # sequence, pad1, pad2
+    _REQ_HEADER = struct.Struct(">BBBBHHIII")
+    # Reply header: version, pkt_type, res1, res2, command, reply, status,
+    # pad1-3, sequence, pad4, pad5
+    _RPY_HEADER = struct.Struct(">BBBBHHHHHHIII")
+    # RPY_Tracking: ref_id, ip_addr, stratum, leap_status, ref_time,
+    # then nine chrony floats
+    _RPY_TRACKING = struct.Struct(">I20sHH12s9I")
+    _RPY_LEN = _RPY_HEADER.size + _RPY_TRACKING.size
+
+    LEAP_STATUS = {0: "Normal", 1: "Insert second", 2: "Delete second", 3: "Not synchronised"}
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 323, timeout: float = 1.0):
+        self.addr = (host, port)
+        self.timeout = timeout
+        self.sock = None
+
+    def _socket(self):
+        if self.sock is None:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.settimeout(self.timeout)
+            self.sock.connect(self.addr)
+        return self.sock
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def tracking(self) -> Optional[Dict[str, Any]]:
+        """
+        Query chronyd tracking state. Returns a dict of metrics or None.
+        """
+        seq = random.getrandbits(32)
+        req = self._REQ_HEADER.pack(
+            self.PROTO_VERSION, self.PKT_TYPE_CMD_REQUEST, 0, 0,
+            self.REQ_TRACKING, 0, seq, 0, 0
+        )
+        # chronyd ignores requests shorter than their reply (anti-amplification)
+        req = req.ljust(self._RPY_LEN, b"\0")
+
+        try:
+            sock = self._socket()
+            sock.send(req)
+            data = sock.recv(512)
+        except OSError:
+            self.close()
+            return None
+
+        if len(data) < self._RPY_LEN:
+            return None
+
+        (version, pkt_type, _, _, _, reply, status,
+         _, _, _, rseq, _, _) = self._RPY_HEADER.unpack_from(data)
+        if (pkt_type != self.PKT_TYPE_CMD_REPLY or reply != self.RPY_TRACKING
+                or status != self.STT_SUCCESS or rseq != seq):
+            return None
+
+        ref_id, _, stratum, leap, _, *floats = self._RPY_TRACKING.unpack_from(
+            data, self._RPY_HEADER.size
+        )
+        (correction, last_offset, rms_offset, freq_ppm, resid_freq_ppm,
+         skew_ppm, root_delay, root_dispersion, update_interval) = map(_chrony_float, floats)
+
+        return {
+            "reference_id": f"{ref_id:08X}",
+            "stratum": stratum,
+            "leap_status": self.LEAP_STATUS.get(leap, "Unknown"),
+            "system_time_offset_s": correction,
+            "last_offset_s": last_offset,
+            "rms_offset_s": rms_offset,
+            "frequency_ppm": freq_ppm,
+            "residual_freq_ppm": resid_freq_ppm,
+            "skew_ppm": skew_ppm,
+            "root_delay_s": root_delay,
+            "root_dispersion_s": root_dispersion,
+            "update_interval_s": update_interval,
+        }
+
+
+# ----------------------------------------------------------------------
+#  'chronyc tracking' text parser (fallback when the UDP port is closed)
+# ----------------------------------------------------------------------
+
+_CHRONY_LINE = re.compile(r"^([^:]+?)\s*:\s*(.*)$", re.MULTILINE)
+
+
+def _first_float(value: str) -> float:
+    return float(value.split()[0])
+
+
+def _slow_positive(value: str) -> float:
+    # chronyc prints magnitudes with 'slow'/'fast'; for both system time
+    # and frequency 'slow' corresponds to a positive value on the wire
+    parts = value.split()
+    magnitude = float(parts[0])
+    return magnitude if "slow" in parts else -magnitude
+
+
+_CHRONY_KEYS = {
+    "Reference ID": ("reference_id", lambda v: v.split()[0]),
+    "Stratum": ("stratum", int),
+    "System time": ("system_time_offset_s", _slow_positive),
+    "Last offset": ("last_offset_s", _first_float),
+    "RMS offset": ("rms_offset_s", _first_float),
+    "Frequency": ("frequency_ppm", _slow_positive),
+    "Residual freq": ("residual_freq_ppm", _first_float),
+    "Skew": ("skew_ppm", _first_float),
+    "Root delay": ("root_delay_s", _first_float),
+    "Root dispersion": ("root_dispersion_s", _first_float),
+    "Update interval": ("update_interval_s", _first_float),
+    "Leap status": ("leap_status", str.strip),
+}
+
+
+def parse_chrony_tracking(out: str) -> Optional[Dict[str, Any]]:
+    """
+    Parse 'chronyc tracking' output into the same keys ChronyClient.tracking
+    returns. Returns None if nothing recognisable was found.
+    """
+    metrics = {}
+    for key, value in _CHRONY_LINE.findall(out):
+        spec = _CHRONY_KEYS.get(key)
+        if spec is None:
+            continue
+        name, parse = spec
+        try:
+            metrics[name] = parse(value)
+        except (ValueError, IndexError):
+            continue
+    return metrics or None